@@ -1,12 +1,19 @@
 import streamlit as st
-import os
 import json
-import re
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
-import requests
-from openai import OpenAI
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+# openai and requests are imported lazily, on the first real query, to keep page loads fast
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Page config
 st.set_page_config(
@@ -17,7 +24,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+_CSS = """
 <style>
     .stChat {
         height: 600px;
@@ -58,249 +65,613 @@ st.markdown("""
         margin-bottom: 1rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def _inject_css():
+    """Inject the custom CSS; cached so reruns replay it instead of rebuilding it."""
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+
+_inject_css()
+
+# Define available HubSpot endpoints and their purposes
+AVAILABLE_ENDPOINTS = MappingProxyType({
+    "deals": {
+        "endpoint": "/crm/v3/objects/deals",
+        "description": "Fetch deals data",
+        "properties": ["dealname", "amount", "dealstage", "closedate", "pipeline", "hubspot_owner_id"],
+        "filters": ["dealstage", "pipeline", "amount"]
+    },
+    "contacts": {
+        "endpoint": "/crm/v3/objects/contacts",
+        "description": "Fetch contacts data",
+        "properties": ["firstname", "lastname", "email", "phone", "company", "jobtitle"],
+        "filters": ["email", "company"]
+    },
+    "companies": {
+        "endpoint": "/crm/v3/objects/companies",
+        "description": "Fetch companies data",
+        "properties": ["name", "domain", "industry", "city", "state", "country", "numberofemployees"],
+        "filters": ["industry", "city", "state"]
+    }
+})
+
+# Deal stages mapping (customize based on your HubSpot setup)
+DEAL_STAGES = MappingProxyType({
+    "appointmentscheduled": "Appointment Scheduled",
+    "qualifiedtobuy": "Qualified to Buy",
+    "presentationscheduled": "Presentation Scheduled",
+    "decisionmakerboughtin": "Decision Maker Bought-In",
+    "contractsent": "Contract Sent",
+    "closedwon": "Closed Won",
+    "closedlost": "Closed Lost"
+})
+
+# Number of records a list response shows
+MAX_RENDERED_RESULTS = 10
+
+# Deals summed by a total query; each 100 costs a rate-limited search call, and
+# HubSpot search cannot page past 10,000 results
+MAX_TOTAL_DEALS = 1000
+
+# HubSpot search operators the interpreter may use in filters
+FILTER_OPERATORS = ("EQ", "NEQ", "LT", "LTE", "GT", "GTE")
+
+# Lowercased stage lookups used to resolve stage names in filters
+_STAGE_BY_LOWER_NAME = MappingProxyType({v.lower(): k for k, v in DEAL_STAGES.items()})
+_STAGE_INDEX = tuple((k, k.lower(), v.lower()) for k, v in DEAL_STAGES.items())
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse JSON with orjson when it is installed."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize JSON to bytes with orjson when it is installed."""
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+
+# Bounds on cached per-key clients, so each distinct key pair's thread pool, session
+# and secrets are released instead of living for the whole process
+CLIENT_CACHE_MAX_ENTRIES = 16
+CLIENT_CACHE_TTL = 3600
+
+
+# (connect, read) timeouts for HubSpot calls, so a hung edge cannot stall the script
+HUBSPOT_TIMEOUT = (3.05, 10)
+
+
+def _is_timeout(error: Exception) -> bool:
+    """Check whether a requests error was caused by a timeout.
+    
+    A read timeout while the response body is downloading surfaces as a
+    ConnectionError wrapping urllib3's ReadTimeoutError rather than a Timeout.
+    """
+    import requests
+    from urllib3.exceptions import TimeoutError as Urllib3TimeoutError
+    
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    return bool(error.args) and isinstance(error.args[0], Urllib3TimeoutError)
+
+
+def _with_script_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap fn so it runs with the calling script's ScriptRunContext attached.
+    
+    The chatbot's worker pool is shared by every session, so the context is attached
+    per task and detached afterwards rather than bound to the pool's threads. This
+    lets worker threads use st.cache_data functions such as _hubspot_search.
+    """
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    
+    ctx = get_script_run_ctx()
+    
+    def run(*args: Any) -> Any:
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        try:
+            return fn(*args)
+        finally:
+            add_script_run_ctx(thread, None)
+    
+    return run
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _hubspot_search(_session: Any, url: str, body_json: bytes, auth: str) -> Dict[str, Any]:
+    """POST a HubSpot search, memoized briefly on the request shape and credentials.
+    
+    The session is excluded from the cache key; auth is only part of the key so
+    that accounts never share cached results.
+    """
+    response = _session.post(url, data=body_json, timeout=HUBSPOT_TIMEOUT)
+    response.raise_for_status()
+    return _json_loads(response.content)
+
+
+@st.cache_resource(max_entries=CLIENT_CACHE_MAX_ENTRIES, ttl=CLIENT_CACHE_TTL)
+def get_openai_client(openai_key: str) -> "OpenAI":
+    """Return an OpenAI client for the given key, reused across Streamlit reruns."""
+    from openai import OpenAI
+    
+    return OpenAI(api_key=openai_key)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _interpret(user_query: str, system_prompt: str, tool: Dict[str, Any], openai_key: str) -> Dict[str, Any]:
+    """Run the OpenAI interpretation call, memoized on the query text."""
+    response = get_openai_client(openai_key).chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_query}
+        ],
+        tools=[tool],
+        tool_choice={"type": "function", "function": {"name": tool["function"]["name"]}}
+    )
+    
+    return _json_loads(response.choices[0].message.tool_calls[0].function.arguments)
+
 
 class HubSpotChatbot:
     """A chatbot that interprets natural language queries and fetches data from HubSpot API."""
     
+    available_endpoints = AVAILABLE_ENDPOINTS
+    deal_stages = DEAL_STAGES
+    _stage_by_lower_name = _STAGE_BY_LOWER_NAME
+    _stage_index = _STAGE_INDEX
+    
+    # Properties that format_response renders for each (object_type, summary_type)
+    PROPS_FOR = {
+        ("deals", "list"): ["dealname", "amount", "dealstage", "closedate"],
+        ("deals", "total"): ["amount"],
+        ("deals", "count"): [],
+        ("contacts", "list"): ["firstname", "lastname", "email", "company"],
+        ("contacts", "count"): [],
+        ("companies", "list"): ["name", "industry", "domain"],
+        ("companies", "count"): []
+    }
+    
     def __init__(self, hubspot_api_key: str, openai_api_key: str):
         """Initialize the chatbot with API keys."""
         self.hubspot_api_key = hubspot_api_key
-        self.openai_client = OpenAI(api_key=openai_api_key)
+        self._openai_api_key = openai_api_key
         self.base_url = "https://api.hubapi.com"
         
-        # Define available HubSpot endpoints and their purposes
-        self.available_endpoints = {
-            "deals": {
-                "endpoint": "/crm/v3/objects/deals",
-                "description": "Fetch deals data",
-                "properties": ["dealname", "amount", "dealstage", "closedate", "pipeline", "hubspot_owner_id"],
-                "filters": ["dealstage", "pipeline", "amount"]
-            },
-            "contacts": {
-                "endpoint": "/crm/v3/objects/contacts",
-                "description": "Fetch contacts data",
-                "properties": ["firstname", "lastname", "email", "phone", "company", "jobtitle"],
-                "filters": ["email", "company"]
-            },
-            "companies": {
-                "endpoint": "/crm/v3/objects/companies",
-                "description": "Fetch companies data",
-                "properties": ["name", "domain", "industry", "city", "state", "country", "numberofemployees"],
-                "filters": ["industry", "city", "state"]
-            }
-        }
-        
-        # Deal stages mapping (customize based on your HubSpot setup)
-        self.deal_stages = {
-            "appointmentscheduled": "Appointment Scheduled",
-            "qualifiedtobuy": "Qualified to Buy",
-            "presentationscheduled": "Presentation Scheduled",
-            "decisionmakerboughtin": "Decision Maker Bought-In",
-            "contractsent": "Contract Sent",
-            "closedwon": "Closed Won",
-            "closedlost": "Closed Lost"
-        }
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        # Pooled HTTP session so HubSpot calls reuse a warm keep-alive connection
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=2,
+                connect=1,
+                read=False,  # a read timeout is not retried; it already cost the full read timeout
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "POST"],  # HubSpot searches are read-only POSTs
+                backoff_factor=0.25,
+                respect_retry_after_header=True
+            )
+        ))
+        self.session.headers.update({
+            "Authorization": f"Bearer {hubspot_api_key}",
+            "Content-Type": "application/json"
+        })
+        
+        # Worker pool for HubSpot calls that run alongside the OpenAI call
+        self._pool = ThreadPoolExecutor(max_workers=4)
 
-    def interpret_query(self, user_query: str) -> Dict[str, Any]:
-        """Use OpenAI to interpret the user's natural language query."""
-        system_prompt = f"""You are a HubSpot API query interpreter. Analyze the user's question and extract:
-        1. The object type they're asking about (deals, contacts, or companies)
-        2. Any filters they want to apply
-        3. What specific information they want to see
+    def interpret_query(self, user_query: str) -> List[Dict[str, Any]]:
+        """Use OpenAI to interpret the user's natural language query into one or more sub-queries."""
+        system_prompt = f"""You are a HubSpot API query interpreter. Call query_hubspot with one entry
+        per object type the user is asking about, giving any filters to apply, the properties to show,
+        and whether they want a list, a count, or a total (deals only).
         
         Available deal stages: {', '.join(self.deal_stages.values())}
-        
-        Return a JSON object with:
-        - object_type: "deals", "contacts", or "companies"
-        - filters: object with filter criteria
-        - properties: array of properties to return
-        - limit: number of results (default 10)
-        - summary_type: "list", "count", "total" (for aggregations)
-        
-        Examples:
-        "What deals are in negotiation?" -> {{"object_type": "deals", "filters": {{"dealstage": "decisionmakerboughtin"}}, "properties": ["dealname", "amount", "closedate"], "limit": 10, "summary_type": "list"}}
-        "How many contacts do we have?" -> {{"object_type": "contacts", "filters": {{}}, "properties": ["email"], "limit": 1000, "summary_type": "count"}}
-        "Total value of deals in contract sent stage?" -> {{"object_type": "deals", "filters": {{"dealstage": "contractsent"}}, "properties": ["amount"], "limit": 1000, "summary_type": "total"}}
         """
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_query}
-                ],
-                response_format={"type": "json_object"}
-            )
-            
-            return json.loads(response.choices[0].message.content)
+            result = _interpret(user_query, system_prompt, self.build_query_tool(), self._openai_api_key)
+            return result.get("queries") or [result]
         except Exception as e:
             st.error(f"Error interpreting query: {e}")
-            return {
+            return [{
                 "object_type": "deals",
                 "filters": {},
                 "properties": ["dealname", "amount"],
                 "limit": 10,
                 "summary_type": "list"
+            }]
+
+    def build_query_tool(self) -> Dict[str, Any]:
+        """Build the OpenAI tool declaration describing a HubSpot query."""
+        properties = sorted({
+            prop
+            for endpoint_info in self.available_endpoints.values()
+            for prop in endpoint_info["properties"]
+        })
+        
+        return {
+            "type": "function",
+            "function": {
+                "name": "query_hubspot",
+                "description": "Query HubSpot CRM records",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "queries": {
+                            "type": "array",
+                            "minItems": 1,
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "object_type": {
+                                        "type": "string",
+                                        "enum": list(self.available_endpoints)
+                                    },
+                                    "filters": {
+                                        "type": "object",
+                                        "description": (
+                                            "Property name to value filters, all of which must match, e.g. "
+                                            "{\"dealstage\": \"contractsent\"}. For comparisons use an object, e.g. "
+                                            "{\"amount\": {\"operator\": \"GT\", \"value\": 10000}}. "
+                                            f"Operators: {', '.join(FILTER_OPERATORS)}"
+                                        ),
+                                        "additionalProperties": {
+                                            "anyOf": [
+                                                {"type": ["string", "number", "boolean"]},
+                                                {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "operator": {"type": "string", "enum": list(FILTER_OPERATORS)},
+                                                        "value": {"type": ["string", "number", "boolean"]}
+                                                    },
+                                                    "required": ["operator", "value"]
+                                                }
+                                            ]
+                                        }
+                                    },
+                                    "properties": {
+                                        "type": "array",
+                                        "items": {"type": "string", "enum": properties}
+                                    },
+                                    "limit": {
+                                        "type": "integer",
+                                        "minimum": 1,
+                                        "maximum": 100,
+                                        "description": "Number of results (default 10)"
+                                    },
+                                    "summary_type": {
+                                        "type": "string",
+                                        "enum": ["list", "count", "total"]
+                                    }
+                                },
+                                "required": ["object_type", "summary_type"]
+                            }
+                        }
+                    },
+                    "required": ["queries"]
+                }
             }
+        }
+
+    def _resolve_deal_stage(self, value: str) -> str:
+        """Find the internal stage key for a stage name or partial name."""
+        vl = value.lower()
+        stage_key = self._stage_by_lower_name.get(vl)
+        if stage_key:
+            return stage_key
+        
+        for stage_key, key_lower, name_lower in self._stage_index:
+            if vl == key_lower or name_lower in vl or vl in name_lower:
+                return stage_key
+        return value
+
+    def build_filter_groups(self, object_type: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build HubSpot filter groups from the interpreted filters.
+        
+        All filters go into a single group, since HubSpot ORs separate groups and ANDs
+        the filters within one. A filter value is either a plain value (EQ) or an
+        {"operator": ..., "value": ...} object.
+        """
+        group = []
+        for key, value in filters.items():
+            operator = "EQ"
+            if isinstance(value, dict):
+                operator = str(value.get("operator", "EQ")).upper()
+                value = value.get("value")
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator {operator!r} for {key}")
+            
+            # Map deal stage names to internal values
+            if key == "dealstage" and object_type == "deals" and isinstance(value, str):
+                value = self._resolve_deal_stage(value)
+            
+            group.append({
+                "propertyName": key,
+                "operator": operator,
+                "value": value
+            })
+        return [{"filters": group}] if group else []
 
     def build_api_request(self, interpretation: Dict[str, Any]) -> Dict[str, Any]:
         """Build the HubSpot API request based on the interpreted query."""
         object_type = interpretation.get("object_type", "deals")
         endpoint_info = self.available_endpoints.get(object_type, self.available_endpoints["deals"])
+        summary_type = interpretation.get("summary_type", "list")
+        filter_groups = self.build_filter_groups(object_type, interpretation.get("filters", {}))
         
         # Build the API URL
         url = f"{self.base_url}{endpoint_info['endpoint']}"
         
-        # Build query parameters
-        params = {
-            "limit": min(interpretation.get("limit", 10), 100),  # HubSpot API limit
-            "properties": ",".join(interpretation.get("properties", endpoint_info["properties"][:3]))
-        }
+        # Counts only need the search total, so ask for a single record
+        if summary_type == "count":
+            return {
+                "url": f"{url}/search",
+                "body": self._search_body(filter_groups, 1, self.PROPS_FOR.get((object_type, "count"), []))
+            }
         
-        # Add filters if any
-        filters = interpretation.get("filters", {})
-        if filters:
-            filter_groups = []
-            for key, value in filters.items():
-                # Map deal stage names to internal values
-                if key == "dealstage" and object_type == "deals":
-                    # Find the internal stage key
-                    for stage_key, stage_name in self.deal_stages.items():
-                        if stage_name.lower() in value.lower() or value.lower() in stage_name.lower():
-                            value = stage_key
-                            break
-                
-                filter_groups.append({
-                    "filters": [{
-                        "propertyName": key,
-                        "operator": "EQ",
-                        "value": value
-                    }]
-                })
-            
-            if filter_groups:
-                params["filterGroups"] = json.dumps(filter_groups)
+        # Deal totals page through matching deals up to a bound, fetching only the amount
+        if summary_type == "total" and object_type == "deals":
+            return {
+                "url": f"{url}/search",
+                "body": self._search_body(filter_groups, 100, self.PROPS_FOR[("deals", "total")]),
+                "max_rows": MAX_TOTAL_DEALS
+            }
         
+        # Lists only fetch the rows that get rendered; the search total covers the rest
+        limit = min(max(int(interpretation.get("limit", 10)), 1), MAX_RENDERED_RESULTS)
+        properties = (
+            interpretation.get("properties")
+            or self.PROPS_FOR.get((object_type, "list"), endpoint_info["properties"][:3])
+        )
         return {
-            "url": url,
-            "params": params,
-            "headers": {
-                "Authorization": f"Bearer {self.hubspot_api_key}",
-                "Content-Type": "application/json"
-            }
+            "url": f"{url}/search",
+            "body": self._search_body(filter_groups, limit, properties),
+            "max_rows": limit
         }
 
-    def fetch_hubspot_data(self, request_config: Dict[str, Any]) -> Dict[str, Any]:
-        """Make the actual API call to HubSpot."""
+    def _search_body(self, filter_groups: List[Dict[str, Any]], limit: int, properties: List[str]) -> Dict[str, Any]:
+        """Build a search request body, leaving out properties when none are needed."""
+        body = {"filterGroups": filter_groups, "limit": limit}
+        if properties:
+            body["properties"] = list(properties)
+        return body
+
+    def fetch_hubspot_search(self, url: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a search request to HubSpot, raising on HTTP errors."""
+        return _hubspot_search(self.session, url, _json_dumps(body), self.session.headers["Authorization"])
+
+    def _paged_search(self, url: str, body: Dict[str, Any], max_rows: int) -> Dict[str, Any]:
+        """Follow the search cursor until max_rows records (or every page) have been read."""
+        body = dict(body)
+        results = []
+        total = 0
+        while len(results) < max_rows:
+            page = self.fetch_hubspot_search(url, body)
+            results.extend(page.get("results", []))
+            total = page.get("total", len(results))
+            after = page.get("paging", {}).get("next", {}).get("after")
+            if not after:
+                break
+            body["after"] = after
+        
+        return {"total": total, "results": results[:max_rows]}
+
+    def _execute(self, request_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a built request to HubSpot, raising on HTTP errors."""
+        if "max_rows" in request_config:
+            return self._paged_search(request_config["url"], request_config["body"], request_config["max_rows"])
+        return self.fetch_hubspot_search(request_config["url"], request_config["body"])
+
+    def _fetch_quietly(self, request_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Make the API call, returning errors as data rather than reporting them.
+        
+        Runs on worker threads, which must be wrapped with _with_script_context because
+        searches go through the st.cache_data function _hubspot_search.
+        """
+        import requests
+        
         try:
-            response = requests.get(
-                request_config["url"],
-                params=request_config["params"],
-                headers=request_config["headers"]
-            )
-            response.raise_for_status()
-            return response.json()
+            return self._execute(request_config)
         except requests.exceptions.RequestException as e:
-            st.error(f"Error fetching data from HubSpot: {e}")
+            if _is_timeout(e):
+                return {"results": [], "error": "upstream timeout"}
             return {"results": [], "error": str(e)}
 
+    def _guess_object_type(self, user_query: str) -> str:
+        """Guess the object type from keywords, or return "" if it is ambiguous."""
+        query = user_query.lower()
+        keywords = {"deals": "deal", "contacts": "contact", "companies": "compan"}
+        matches = [object_type for object_type, keyword in keywords.items() if keyword in query]
+        return matches[0] if len(matches) == 1 else ""
+
+    def _probe_request(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """Build the speculative unfiltered count request for a count-like query, if any.
+        
+        Probes cost a HubSpot search call, which is rate limited per account, so only
+        queries that look like counts of a single object type get one.
+        """
+        query = user_query.lower()
+        if not any(hint in query for hint in ("how many", "count", "number of")):
+            return None
+        
+        object_type = self._guess_object_type(user_query)
+        if not object_type:
+            return None
+        
+        return self.build_api_request({
+            "object_type": object_type,
+            "filters": {},
+            "summary_type": "count"
+        })
+
     def format_response(self, data: Dict[str, Any], interpretation: Dict[str, Any]) -> str:
         """Format the API response into natural language."""
         if "error" in data:
             return f"❌ Sorry, I encountered an error: {data['error']}"
         
         results = data.get("results", [])
-        if not results:
-            return "🔍 I couldn't find any matching records."
-        
         object_type = interpretation.get("object_type", "records")
         summary_type = interpretation.get("summary_type", "list")
         
+        # Search responses carry the full match count even when no records are returned
+        if summary_type == "count" and "total" in data:
+            return f"📊 Total {object_type}: **{data['total']}**"
+        
+        if not results:
+            return "🔍 I couldn't find any matching records."
+        
         # Handle different summary types
         if summary_type == "count":
             return f"📊 Total {object_type}: **{len(results)}**"
         
         elif summary_type == "total" and object_type == "deals":
             total = sum(float(r.get("properties", {}).get("amount", 0) or 0) for r in results)
+            matching = data.get("total", len(results))
+            if matching > len(results):
+                return (
+                    f"💰 Total deal value: **${total:,.2f}** across the first {len(results)} "
+                    f"of {matching} matching deals (partial total)"
+                )
             return f"💰 Total deal value: **${total:,.2f}** across {len(results)} deals"
         
         # Build the list response
-        response_parts = [f"📋 I found **{len(results)} {object_type}**:\n"]
+        found = max(data.get("total", 0), len(results))
+        response_parts = [f"📋 I found **{found} {object_type}**:\n"]
         
-        for i, result in enumerate(results[:10], 1):  # Show first 10 results
-            properties = result.get("properties", {})
+        deal_stages = self.deal_stages
+        shown_results = results[:MAX_RENDERED_RESULTS]
+        for i, result in enumerate(shown_results, 1):
+            get = (result.get("properties") or {}).get
             
             if object_type == "deals":
-                name = properties.get("dealname", "Unnamed Deal")
-                amount = properties.get("amount", "0")
-                stage = properties.get("dealstage", "N/A")
-                closedate = properties.get("closedate", "N/A")
+                name = get("dealname") or "Unnamed Deal"
+                amount = get("amount", "0")  # HubSpot sends null for an empty amount, shown as N/A
+                stage = get("dealstage") or "N/A"
+                closedate = get("closedate") or "N/A"
                 
                 # Convert stage to readable name
-                if stage in self.deal_stages:
-                    stage = self.deal_stages[stage]
+                stage = deal_stages.get(stage, stage)
                 
                 # Format amount
-                try:
-                    amount_num = float(amount)
-                    amount_str = f"${amount_num:,.2f}"
-                except:
-                    amount_str = "N/A"
+                amount_str = "N/A"
+                if isinstance(amount, (int, float, str)):
+                    try:
+                        amount_str = f"${float(amount):,.2f}"
+                    except ValueError:
+                        pass
                 
-                response_parts.append(f"**{i}.** 🏷️ {name}")
-                response_parts.append(f"   - 💵 Amount: {amount_str}")
-                response_parts.append(f"   - 📊 Stage: {stage}")
-                if closedate != "N/A":
-                    response_parts.append(f"   - 📅 Close Date: {closedate[:10]}")
-                response_parts.append("")
+                response_parts.append(
+                    f"**{i}.** 🏷️ {name}\n   - 💵 Amount: {amount_str}\n   - 📊 Stage: {stage}"
+                    + (f"\n   - 📅 Close Date: {closedate[:10]}" if closedate != "N/A" else "")
+                    + "\n"
+                )
                 
             elif object_type == "contacts":
-                first = properties.get("firstname", "")
-                last = properties.get("lastname", "")
-                email = properties.get("email", "N/A")
-                company = properties.get("company", "N/A")
-                name = f"{first} {last}".strip() or "Unnamed Contact"
+                name = f"{get('firstname') or ''} {get('lastname') or ''}".strip() or "Unnamed Contact"
+                email = get("email") or "N/A"
+                company = get("company") or "N/A"
                 
-                response_parts.append(f"**{i}.** 👤 {name}")
-                response_parts.append(f"   - 📧 Email: {email}")
-                if company != "N/A":
-                    response_parts.append(f"   - 🏢 Company: {company}")
-                response_parts.append("")
+                response_parts.append(
+                    f"**{i}.** 👤 {name}\n   - 📧 Email: {email}"
+                    + (f"\n   - 🏢 Company: {company}" if company != "N/A" else "")
+                    + "\n"
+                )
                 
             elif object_type == "companies":
-                name = properties.get("name", "Unnamed Company")
-                industry = properties.get("industry", "N/A")
-                domain = properties.get("domain", "N/A")
+                name = get("name") or "Unnamed Company"
+                industry = get("industry") or "N/A"
+                domain = get("domain") or "N/A"
                 
-                response_parts.append(f"**{i}.** 🏢 {name}")
-                if industry != "N/A":
-                    response_parts.append(f"   - 🏭 Industry: {industry}")
-                if domain != "N/A":
-                    response_parts.append(f"   - 🌐 Domain: {domain}")
-                response_parts.append("")
+                response_parts.append(
+                    f"**{i}.** 🏢 {name}"
+                    + (f"\n   - 🏭 Industry: {industry}" if industry != "N/A" else "")
+                    + (f"\n   - 🌐 Domain: {domain}" if domain != "N/A" else "")
+                    + "\n"
+                )
         
-        if len(results) > 10:
-            response_parts.append(f"\n_...and {len(results) - 10} more results._")
+        shown = len(shown_results)
+        if found > shown:
+            response_parts.append(f"\n_...and {found - shown} more results._")
         
         return "\n".join(response_parts)
 
-    def process_query(self, user_query: str) -> str:
-        """Main method to process a user query end-to-end."""
-        # Step 1: Interpret the query
-        interpretation = self.interpret_query(user_query)
-        
-        # Step 2: Build API request
-        request_config = self.build_api_request(interpretation)
-        
-        # Step 3: Fetch data from HubSpot
-        data = self.fetch_hubspot_data(request_config)
-        
-        # Step 4: Format response
-        response = self.format_response(data, interpretation)
+    def format_response_stream(self, data: Dict[str, Any], interpretation: Dict[str, Any]) -> Iterator[str]:
+        """Yield the formatted response line by line for st.write_stream."""
+        yield from self.format_response(data, interpretation).splitlines(keepends=True)
+
+    def _iter_results(self, user_query: str) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Interpret the query and yield (data, interpretation) for each sub-query as its fetch completes."""
+        # Start a speculative HubSpot probe while OpenAI interprets the query
+        probe_request = self._probe_request(user_query)
+        probe_future = (
+            self._pool.submit(_with_script_context(self._fetch_quietly), probe_request)
+            if probe_request else None
+        )
         
-        return response
+        # Step 1: Interpret the query
+        interpretations = self.interpret_query(user_query)
+        
+        # Step 2: Build API requests
+        request_configs = [self.build_api_request(interpretation) for interpretation in interpretations]
+        
+        # Step 3: Fetch data from HubSpot concurrently, waiting on the probe only where it made the same request
+        def fetch(request_config: Dict[str, Any]) -> Dict[str, Any]:
+            if probe_future is not None and request_config == probe_request:
+                data = probe_future.result()
+                if "error" not in data:
+                    return data
+            return self._fetch_quietly(request_config)
+        
+        futures = {
+            self._pool.submit(_with_script_context(fetch), request_config): interpretation
+            for request_config, interpretation in zip(request_configs, interpretations)
+        }
+        for future in as_completed(futures):
+            data = future.result()
+            if "error" in data:
+                st.error(f"Error fetching data from HubSpot: {data['error']}")
+            yield data, futures[future]
+
+    def process_query_stream(self, user_query: str) -> Iterator[str]:
+        """Process a user query end-to-end, streaming each sub-query's block as soon as its data arrives."""
+        for i, (data, interpretation) in enumerate(self._iter_results(user_query)):
+            if i:
+                yield "\n\n"
+            yield from self.format_response_stream(data, interpretation)
+
+
+# Identical consecutive user turns this close together are treated as accidental double submits
+DUPLICATE_TURN_WINDOW = 2.0
+
+
+@st.cache_resource(max_entries=CLIENT_CACHE_MAX_ENTRIES, ttl=CLIENT_CACHE_TTL)
+def get_chatbot(hubspot_key: str, openai_key: str) -> HubSpotChatbot:
+    """Return a chatbot for the given keys, reused across Streamlit reruns."""
+    return HubSpotChatbot(hubspot_key, openai_key)
+
+
+def queue_query(query: str):
+    """Button callback that queues a query to be answered in the chat column on this run."""
+    st.session_state.current_query = query
+
+
+def recent_duplicate_turn(prompt: str) -> Optional[Dict[str, Any]]:
+    """Return the latest user turn if it repeats prompt within DUPLICATE_TURN_WINDOW seconds."""
+    for message in reversed(st.session_state.messages[-2:]):
+        if message["role"] == "user":
+            if message["content"] == prompt and time.monotonic() - message.get("ts", 0) < DUPLICATE_TURN_WINDOW:
+                return message
+            break
+    return None
 
 
 def main():
@@ -356,8 +727,7 @@ def main():
         ]
         
         for query in example_queries:
-            if st.button(f"📝 {query}", key=f"example_{query}"):
-                st.session_state.current_query = query
+            st.button(f"📝 {query}", key=f"example_{query}", on_click=queue_query, args=(query,))
     
     # Main chat interface
     col1, col2 = st.columns([2, 1])
@@ -372,29 +742,34 @@ def main():
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
         
-        # Chat input
-        if prompt := st.chat_input("Ask me about your HubSpot data..."):
+        # Chat input, or a query queued by an example/quick-action button callback
+        pending_query = st.session_state.pop("current_query", None)
+        if prompt := st.chat_input("Ask me about your HubSpot data...") or pending_query:
+            duplicate = recent_duplicate_turn(prompt)
             if not keys_provided:
                 st.error("❌ Please provide both API keys in the sidebar first!")
+            elif duplicate is not None and duplicate is not st.session_state.messages[-1]:
+                # The same question was just answered; skip the repeat round-trip
+                pass
             else:
-                # Add user message to chat history
-                st.session_state.messages.append({"role": "user", "content": prompt})
-                with st.chat_message("user"):
-                    st.markdown(prompt)
+                # Add user message to chat history, unless it is an interrupted duplicate already shown
+                if duplicate is None:
+                    st.session_state.messages.append({"role": "user", "content": prompt, "ts": time.monotonic()})
+                    with st.chat_message("user"):
+                        st.markdown(prompt)
                 
                 # Generate response
                 with st.chat_message("assistant"):
                     with st.spinner("🔍 Searching HubSpot data..."):
                         try:
-                            # Initialize chatbot
-                            chatbot = HubSpotChatbot(
+                            # Get the cached chatbot
+                            chatbot = get_chatbot(
                                 st.session_state.hubspot_key,
                                 st.session_state.openai_key
                             )
                             
-                            # Process query
-                            response = chatbot.process_query(prompt)
-                            st.markdown(response)
+                            # Process query, streaming the response as it is produced
+                            response = st.write_stream(chatbot.process_query_stream(prompt))
                             
                             # Add assistant response to chat history
                             st.session_state.messages.append({"role": "assistant", "content": response})
@@ -403,29 +778,6 @@ def main():
                             error_msg = f"❌ An error occurred: {str(e)}"
                             st.error(error_msg)
                             st.session_state.messages.append({"role": "assistant", "content": error_msg})
-        
-        # Handle example query button clicks
-        if "current_query" in st.session_state:
-            query = st.session_state.current_query
-            del st.session_state.current_query
-            
-            if keys_provided:
-                # Add user message to chat history
-                st.session_state.messages.append({"role": "user", "content": query})
-                
-                # Generate response
-                try:
-                    chatbot = HubSpotChatbot(
-                        st.session_state.hubspot_key,
-                        st.session_state.openai_key
-                    )
-                    response = chatbot.process_query(query)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    st.rerun()
-                except Exception as e:
-                    error_msg = f"❌ An error occurred: {str(e)}"
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
-                    st.rerun()
     
     with col2:
         st.header("📊 Quick Stats")
@@ -434,17 +786,13 @@ def main():
             # Add some quick stats buttons
             st.markdown("### Quick Actions")
             
-            if st.button("📈 Total Deals Count"):
-                st.session_state.current_query = "How many deals do we have in total?"
+            st.button("📈 Total Deals Count", on_click=queue_query, args=("How many deals do we have in total?",))
             
-            if st.button("💰 Pipeline Value"):
-                st.session_state.current_query = "What's the total value of all deals?"
+            st.button("💰 Pipeline Value", on_click=queue_query, args=("What's the total value of all deals?",))
             
-            if st.button("👥 Contact Count"):
-                st.session_state.current_query = "How many contacts are in the system?"
+            st.button("👥 Contact Count", on_click=queue_query, args=("How many contacts are in the system?",))
             
-            if st.button("🏢 Company Count"):
-                st.session_state.current_query = "How many companies do we have?"
+            st.button("🏢 Company Count", on_click=queue_query, args=("How many companies do we have?",))
             
             st.divider()
             